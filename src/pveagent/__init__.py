@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import random
+import socket
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+# Upper bound on a whole guest agent command, not on each socket operation
+guest_agent_timeout = 2
+# Cached fsinfo is refreshed once it is this old
+guest_fs_ttl = 300
+# Cached fsinfo is still served while refreshes fail, up to this age
+guest_fs_max_age = 1800
+# Agents that failed are not retried for this many seconds
+guest_agent_retry = 60
+
+qga_socket_path = lambda vm_id: f"/var/run/qemu-server/{vm_id}.qga"
+
+# vmid: (config mtime, agent enabled)
+_agent_enabled_cache = {}
+
+# vmid: (qemu pid, timestamp, fsinfo)
+_fsinfo_cache = {}
+# vmid: (qemu pid, timestamp of last failure)
+_fsinfo_failures = {}
+_fsinfo_inflight = set()
+_fsinfo_lock = Lock()
+
+# Agents are queried in the background so a stuck agent never holds up a scrape
+_refresh_executor = ThreadPoolExecutor(max_workers=4)
+
+class GuestAgentError(Exception):
+    pass
+
+def agent_enabled(vm_id):
+    """
+    Check the VM config for an enabled guest agent (agent: 1 or agent: enabled=1,...).
+    Results are cached until the config file changes.
+    """
+    cfg_path = f"/etc/pve/qemu-server/{vm_id}.conf"
+    try:
+        current_mtime = os.path.getmtime(cfg_path)
+
+        cached = _agent_enabled_cache.get(vm_id)
+        if cached and cached[0] == current_mtime:
+            return cached[1]
+
+        enabled = False
+        with open(cfg_path, 'r') as f:
+            for line in f:
+                # Snapshot sections follow the current config
+                if line.startswith('['):
+                    break
+                if line.startswith('agent:'):
+                    for opt in line.split(':', 1)[1].strip().split(','):
+                        if opt in ('1', 'enabled=1'):
+                            enabled = True
+    except OSError:
+        # Config gone, e.g. the VM migrated away
+        return False
+
+    _agent_enabled_cache[vm_id] = (current_mtime, enabled)
+    return enabled
+
+def _set_remaining(sock, deadline):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise socket.timeout("guest agent command timed out")
+    sock.settimeout(remaining)
+
+def _read_line(sock, buf, deadline):
+    while b'\n' not in buf:
+        _set_remaining(sock, deadline)
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise GuestAgentError("connection closed by agent")
+        buf += chunk
+    line, _, rest = buf.partition(b'\n')
+    return line, rest
+
+def _parse_response(line):
+    try:
+        response = json.loads(line)
+    except ValueError:
+        raise GuestAgentError(f"agent returned invalid JSON: {line!r}")
+    if not isinstance(response, dict):
+        raise GuestAgentError(f"agent returned malformed response: {line!r}")
+    return response
+
+def qga_command(vm_id, command, arguments=None, timeout=None, socket_path=None):
+    """
+    Run a single guest agent command over the VM's QGA socket and return its result.
+    The whole exchange is bounded by timeout, raises GuestAgentError on agent errors.
+    """
+    if timeout is None:
+        timeout = guest_agent_timeout
+    if socket_path is None:
+        socket_path = qga_socket_path(vm_id)
+    deadline = time.monotonic() + timeout
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        _set_remaining(sock, deadline)
+        sock.connect(socket_path)
+
+        # Flush any stale output from a previous client. The response to
+        # guest-sync-delimited is preceded by a 0xFF sentinel byte.
+        sync_id = random.randint(1, 2**31)
+        _set_remaining(sock, deadline)
+        sock.sendall(b'\xff' + json.dumps({"execute": "guest-sync-delimited", "arguments": {"id": sync_id}}).encode() + b'\n')
+        buf = b''
+        while b'\xff' not in buf:
+            _set_remaining(sock, deadline)
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise GuestAgentError("connection closed by agent")
+            buf += chunk
+        buf = buf.rpartition(b'\xff')[2]
+        line, buf = _read_line(sock, buf, deadline)
+        if _parse_response(line).get("return") != sync_id:
+            raise GuestAgentError(f"guest-sync-delimited returned unexpected response: {line!r}")
+
+        request = {"execute": command}
+        if arguments:
+            request["arguments"] = arguments
+        _set_remaining(sock, deadline)
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        line, buf = _read_line(sock, buf, deadline)
+    finally:
+        sock.close()
+
+    response = _parse_response(line)
+    if "error" in response:
+        raise GuestAgentError(f"{command} failed: {response['error']}")
+    if "return" not in response:
+        raise GuestAgentError(f"{command} returned malformed response: {line!r}")
+    return response["return"]
+
+def _refresh_fsinfo(vm_id, pid):
+    try:
+        fsinfo = qga_command(vm_id, "guest-get-fsinfo")
+        with _fsinfo_lock:
+            _fsinfo_cache[vm_id] = (pid, time.time(), fsinfo)
+            _fsinfo_failures.pop(vm_id, None)
+    except Exception as e:
+        # Keep serving the last good entry until it hits guest_fs_max_age
+        logging.debug(f"_refresh_fsinfo: guest agent for {vm_id=} did not respond: {e}")
+        with _fsinfo_lock:
+            _fsinfo_failures[vm_id] = (pid, time.time())
+    finally:
+        # Always release the VM, otherwise it is never refreshed again
+        with _fsinfo_lock:
+            _fsinfo_inflight.discard(vm_id)
+
+def get_guest_fsinfo(vm_id, pid):
+    """
+    Return the last guest-get-fsinfo result for this instance (qemu pid) of vm_id, or None if there is none.
+    Never blocks on the agent: stale or missing entries are refreshed in the background.
+    """
+    now = time.time()
+    with _fsinfo_lock:
+        cached = _fsinfo_cache.get(vm_id)
+        if cached and (cached[0] != pid or now - cached[1] >= guest_fs_max_age):
+            # From a previous run of the VM, or refreshes kept failing
+            del _fsinfo_cache[vm_id]
+            cached = None
+        stale = cached is None or now - cached[1] >= guest_fs_ttl
+
+        failed_pid, failed_at = _fsinfo_failures.get(vm_id, (None, 0))
+        backing_off = failed_pid == pid and now - failed_at < guest_agent_retry
+        if stale and not backing_off and vm_id not in _fsinfo_inflight:
+            _fsinfo_inflight.add(vm_id)
+            _refresh_executor.submit(_refresh_fsinfo, vm_id, pid)
+    return cached[2] if cached else None
+
+def prune_guest_agent_state(running_ids):
+    """
+    Forget cached agent state of VMs that are no longer running on this node.
+    """
+    with _fsinfo_lock:
+        for state in (_fsinfo_cache, _fsinfo_failures):
+            for vm_id in list(state):
+                if vm_id not in running_ids:
+                    del state[vm_id]
+    for vm_id in list(_agent_enabled_cache):
+        if vm_id not in running_ids:
+            del _agent_enabled_cache[vm_id]
+
+if __name__ == "__main__":
+    import sys
+    print(json.dumps(qga_command(sys.argv[1], "guest-get-fsinfo")))
@@ -3,6 +3,8 @@ import random
 import pexpect
 import logging
 from functools import wraps
+from threading import Lock
+from concurrent.futures import Future
 
 from datetime import datetime, timedelta
 
@@ -13,6 +15,9 @@ global_qm_timeout = 10
 qm_max_ttl = 600
 qm_rand = 60
 
+# Minimum age (seconds) before a coalesced result is recomputed
+coalesce_min_freshness = 0
+
 def ttl_cache_with_randomness(max_ttl, randomness_factor):
     cache = {}
     def decorator(func):
@@ -42,6 +47,52 @@ def ttl_cache_with_randomness(max_ttl, randomness_factor):
         return wrapper
     return decorator
 
+def coalesce_calls(func):
+    """
+    Share a single in-flight call between concurrent callers.
+    Callers arriving while func is running wait for and receive the same result.
+    A finished result is reused until it is older than coalesce_min_freshness.
+    func's arguments are not part of the key, so only use this on zero-arg functions.
+    """
+    lock = Lock()
+    state = {
+        'inflight': None,
+        'result': None,
+        'timestamp': 0,
+    }
+
+    @wraps(func)
+    def wrapper():
+        with lock:
+            if state['timestamp'] and time.time() - state['timestamp'] < coalesce_min_freshness:
+                return state['result']
+            future = state['inflight']
+            leader = future is None
+            if leader:
+                future = Future()
+                state['inflight'] = future
+
+        if not leader:
+            logging.debug(f"coalesce_calls: attaching to in-flight {func.__name__}()")
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            with lock:
+                state['inflight'] = None
+            future.set_exception(e)
+            raise
+
+        with lock:
+            state['result'] = result
+            state['timestamp'] = time.time()
+            state['inflight'] = None
+        future.set_result(result)
+        return result
+
+    return wrapper
+
 @ttl_cache_with_randomness(qm_max_ttl, qm_rand)
 def qm_term_cmd(vm_id, cmd, timeout=global_qm_timeout): # TODO: ignore cmd timeout in cache key
     global deferred_closing
@@ -18,12 +18,23 @@ import cProfile
 from concurrent.futures import ThreadPoolExecutor
 from threading import Lock
 
+import pveagent
 import pvecommon
 import pvestorage
 import qmblock
 
 import builtins
 
+# vCPU thread IDs per VM, keyed by vmid: (qemu pid, {vcpu: tid})
+# Thread IDs only change when the VM restarts (or vCPUs are hotplugged)
+vcpu_thread_cache = {}
+
+# vhost worker thread IDs inside each qemu process, keyed by qemu pid: (thread count, [tid])
+# Kernels with vhost_task run vhost workers as qemu threads rather than kernel threads
+vhost_thread_cache = {}
+
+clock_ticks = os.sysconf('SC_CLK_TCK')
+
 # Cache for pool data
 pool_cache = {
     'last_mtime': 0,
@@ -51,19 +62,57 @@ gauge_settings = [
     ('kvm_io_write_bytes', 'Number of bytes written to disk', ['id']),
     ('kvm_io_write_chars', 'Number of bytes written including buffers', ['id']),
 
+    ('kvm_vcpu_run_time', 'Time (seconds) the vCPU thread spent running on a host CPU', ['id', 'vcpu']),
+    ('kvm_vcpu_wait_time', 'Time (seconds) the vCPU thread spent runnable, waiting for a host CPU', ['id', 'vcpu']),
+    ('kvm_vcpu_timeslices', 'Number of timeslices the vCPU thread ran for', ['id', 'vcpu']),
+    ('kvm_vcpu_last_cpu', 'Host CPU the vCPU thread last ran on', ['id', 'vcpu']),
+
     ('kvm_nic_queues', 'Number of queues in multiqueue config', ['id', 'ifname']),
+    ('kvm_vhost_worker_cpu', 'CPU time (seconds) of each vhost worker. vhost-net runs one worker per NIC queue pair', ['id', 'worker', 'mode']),
+    ('kvm_vhost_worker_imbalance', 'Max/mean CPU time across the vhost workers of the VM', ['id']),
 
     ('kvm_disk_size', 'Size of virtual disk', ['id', 'disk_name']),
+
+    ('kvm_guest_fs_size', 'Size (bytes) of a filesystem inside the guest, from the guest agent', ['id', 'mountpoint', 'fstype', 'name']),
+    ('kvm_guest_fs_used', 'Used bytes of a filesystem inside the guest, from the guest agent', ['id', 'mountpoint', 'fstype', 'name']),
+]
+
+# Per-pool aggregates, labelled by pool, pool level and scope:
+# scope="pool" covers VMs directly in the pool, scope="subtree" also includes nested pools
+pool_rollup_settings = [
+    ('kvm_pool_vms', 'Number of running VMs', 'vms'),
+    ('kvm_pool_vcores', 'vCores allocated to running VMs', 'vcores'),
+    ('kvm_pool_maxmem', 'Maximum memory (bytes) allocated to running VMs', 'maxmem'),
+    ('kvm_pool_rss', 'Resident memory (bytes) of KVM processes', 'rss'),
+    ('kvm_pool_cpu', 'CPU time (user + system, including vhost threads) of KVM processes', 'cpu_seconds'),
+    ('kvm_pool_io_read_bytes', 'Bytes read from disk by KVM processes', 'io_read_bytes'),
+    ('kvm_pool_io_write_bytes', 'Bytes written to disk by KVM processes', 'io_write_bytes'),
+    ('kvm_pool_nic_rx_bytes', 'Bytes received on VM tap interfaces', 'nic_rx_bytes'),
+    ('kvm_pool_nic_tx_bytes', 'Bytes transmitted on VM tap interfaces', 'nic_tx_bytes'),
 ]
 
+# Fields that are cumulative per VM. Their pool totals only ever grow, so VMs that
+# stop, restart or migrate away don't look like counter resets to rate()
+pool_rollup_counters = ['cpu_seconds', 'io_read_bytes', 'io_write_bytes', 'nic_rx_bytes', 'nic_tx_bytes']
+# Monotonic totals of counter fields, keyed by (pool, level, scope)
+pool_counter_totals = {}
+# Last seen counter values per VM, keyed by vmid: (qemu pid, {field: value})
+pool_counter_last = {}
+
 label_flags = [ "-id", "-name", "-cpu" ]
 get_label_name = lambda flag: flag[1:]
+vhost_name_re = re.compile(r'^vhost-(\d+)$')
 info_settings = [
     ('kvm', 'information for each KVM process'),
 ]
 
 flag_to_label_value = lambda args, match: next((args[i+1] for i, x in enumerate(args[:-1]) if x == match), "unknown").split(",")[0]
 
+def smp_vcpus(cmdline):
+    # -smp looks like '4,sockets=1,cores=4,maxcpus=4', the first token is the boot vCPU count
+    ret = flag_to_label_value(cmdline, "-smp")
+    return int(ret) if ret.isnumeric() else 0
+
 def parse_mem(cmdline):
     ret = flag_to_label_value(cmdline, "-m")
     # lazy way to detect NUMA
@@ -132,6 +181,43 @@ def extract_nic_info_from_monitor(vm_id):
         for netdev, cfg in nics_map.items()
     ]
 
+def extract_vcpu_threads_from_monitor(vm_id, pid, expected_vcpus):
+    cached = vcpu_thread_cache.get(vm_id)
+    if cached and cached[0] == pid:
+        return cached[1]
+
+    # VM restarted, first seen or last result was incomplete, don't trust the monitor cache either
+    pvecommon.qm_term_cmd.invalidate_cache(vm_id, 'info cpus')
+    raw_output = pvecommon.qm_term_cmd(vm_id, 'info cpus')
+    vcpu_threads = {
+        vcpu: tid for vcpu, tid in re.findall(r'CPU #(\d+):.*?thread_id=(\d+)', raw_output)
+    }
+    # Fewer threads than -smp means a truncated or unparsable reply, query again next time.
+    # More is fine, hotplugged vCPUs are not part of -smp.
+    if vcpu_threads and len(vcpu_threads) >= expected_vcpus:
+        vcpu_thread_cache[vm_id] = (pid, vcpu_threads)
+    else:
+        logging.debug(f"extract_vcpu_threads_from_monitor: found {len(vcpu_threads)} of {expected_vcpus} vCPUs for {vm_id=}, not caching")
+    return vcpu_threads
+
+def read_proc_file(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, 4096)
+    finally:
+        os.close(fd)
+
+def read_vcpu_thread_stats(pid, tid):
+    """
+    Read scheduler stats for a vCPU thread.
+    Returns (run time ns, run-queue wait ns, timeslices, last cpu).
+    """
+    run_ns, wait_ns, timeslices = read_proc_file(f"/proc/{pid}/task/{tid}/schedstat").split()
+    # comm may contain spaces or parens, fields after the last ')' start at field 3 (state)
+    # processor is field 39
+    last_cpu = read_proc_file(f"/proc/{pid}/task/{tid}/stat").rpartition(b')')[2].split()[36]
+    return int(run_ns), int(wait_ns), int(timeslices), int(last_cpu)
+
 def read_interface_stats(ifname):
     stats_dir = f"/sys/class/net/{ifname}/statistics/"
     stats = {}
@@ -143,6 +229,67 @@ def read_interface_stats(ifname):
         pass
     return stats
 
+def find_vhost_threads(pid, num_threads):
+    """
+    List the vhost worker threads (named vhost-<pid>) inside a qemu process.
+    Rescans /proc/<pid>/task only when the thread count changes, e.g. on NIC hotplug.
+    """
+    cached = vhost_thread_cache.get(pid)
+    if cached and cached[0] == num_threads:
+        return cached[1]
+
+    tids = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            try:
+                comm = read_proc_file(f"/proc/{pid}/task/{tid}/comm").strip().decode()
+            except FileNotFoundError:
+                continue
+            if vhost_name_re.match(comm):
+                tids.append(tid)
+    except FileNotFoundError:
+        return []
+    vhost_thread_cache[pid] = (num_threads, tids)
+    return tids
+
+def read_thread_cpu_times(stat_path):
+    """
+    Read (user, system) CPU seconds from a /proc stat file.
+    """
+    # utime and stime are fields 14 and 15, fields after the last ')' start at field 3
+    fields = read_proc_file(stat_path).rpartition(b')')[2].split()
+    return int(fields[11]) / clock_ticks, int(fields[12]) / clock_ticks
+
+def max_mean_ratio(values):
+    """
+    Return max/mean of values: 1.0 when evenly spread, len(values) when one entry has everything.
+    Returns None for fewer than two values or an all-zero list.
+    """
+    if len(values) < 2 or sum(values) == 0:
+        return None
+    return max(values) / (sum(values) / len(values))
+
+def get_vhost_usage(workers):
+    """
+    Sum CPU times and context switches over the vhost kernel threads of a VM.
+    Returns (None, None) if the VM has no vhost kernel threads.
+    """
+    if not workers:
+        return None, None
+    cpu = {"user": 0.0, "system": 0.0}
+    ctx = {"voluntary": 0, "involuntary": 0}
+    for worker in workers:
+        try:
+            cpu_times = worker.cpu_times()
+            ctx_switches = worker.num_ctx_switches()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            continue
+        for mode in cpu:
+            cpu[mode] += getattr(cpu_times, mode)
+        for type in ctx:
+            ctx[type] += getattr(ctx_switches, type)
+    return cpu, ctx
+
 def get_pool_info():
     """
     Read pool information from /etc/pve/user.cfg, caching based on file modification time.
@@ -204,6 +351,47 @@ def get_pool_info():
         logging.warning(f"Could not read pool configuration: {e}")
         return {}, {}
 
+def rollup_pool_usage(vm_usage):
+    """
+    Aggregate per-VM usage into per-pool totals in a single pass.
+    Returns a dict mapping (pool, level, scope) to summed usage fields.
+    VMs outside any pool are rolled up under pool="" level="0".
+    Gauge fields are summed over running VMs. Counter fields add each VM's increase since
+    the last collection to a running per-pool total, so departed VMs keep their contribution.
+    """
+    fields = [field for _, _, field in pool_rollup_settings]
+    rollup = {key: dict(dict.fromkeys(fields, 0), **totals) for key, totals in pool_counter_totals.items()}
+    for id, usage in vm_usage.items():
+        last_pid, last = pool_counter_last.get(id, (None, {}))
+        deltas = {}
+        for field in pool_rollup_counters:
+            if last_pid == usage["pid"]:
+                # Same process, a drop (e.g. NIC unplug) only means no increase
+                deltas[field] = max(0, usage[field] - last.get(field, 0))
+            else:
+                # New or restarted VM, its counters started from zero
+                deltas[field] = usage[field]
+        pool_counter_last[id] = (usage["pid"], {field: usage[field] for field in pool_rollup_counters})
+
+        pool_name = usage["pool"]
+        parts = pool_name.split("/") if pool_name else []
+        keys = [(pool_name, str(len(parts)), "pool")]
+        for level in range(1, len(parts)+1):
+            keys.append(("/".join(parts[:level]), str(level), "subtree"))
+        for key in keys:
+            totals = rollup.setdefault(key, dict.fromkeys(fields, 0))
+            for field in fields:
+                totals[field] += deltas[field] if field in deltas else usage[field]
+
+    # A running VM can be missed for a collection (e.g. /etc/pve briefly unavailable),
+    # only forget it once its qemu process is gone so it isn't counted twice on return
+    for id, (last_pid, _) in list(pool_counter_last.items()):
+        if id not in vm_usage and not psutil.pid_exists(last_pid):
+            del pool_counter_last[id]
+    for key, totals in rollup.items():
+        pool_counter_totals[key] = {field: totals[field] for field in pool_rollup_counters}
+    return rollup
+
 def collect_kvm_metrics():
     logging.debug("collect_kvm_metrics() called")
     gauge_dict = {}
@@ -214,14 +402,29 @@ def collect_kvm_metrics():
     for name, description in info_settings:
         info_dict[name] = InfoMetricFamily(f"{prefix}_{name}", description)
 
+    collect_pool_rollup = cli_args.collect_pool_rollup.lower() == 'true'
+    if collect_pool_rollup:
+        for name, description, _ in pool_rollup_settings:
+            gauge_dict[name] = GaugeMetricFamily(f"{prefix}_{name}", description, labels=['pool', 'level', 'scope'])
+    # Per-VM values feeding the pool rollup, keyed by vmid
+    vm_usage = {}
+
     dynamic_gauges = {}
     gauge_lock = Lock() # avoid race condition when checking and creating gauges
     dynamic_infos = {}
     info_lock = Lock() # avoid race condition when checking and creating infos
 
     procs = []
+    vhost_workers = {}
     for proc in psutil.process_iter(['pid', 'name', 'exe', 'cmdline', 'cpu_percent', 'memory_percent', 'num_threads']):
         try:
+            # vhost kernel threads are named vhost-<qemu pid>. Newer kernels run vhost workers
+            # as threads of the qemu process instead; those are already in its cpu_times()
+            # and never show up here.
+            vhost_match = vhost_name_re.match(proc.info['name'] or '')
+            if vhost_match:
+                vhost_workers.setdefault(int(vhost_match.group(1)), []).append(proc)
+                continue
             if proc.info['exe'] == '/usr/bin/qemu-system-x86_64':
                 vmid = flag_to_label_value(proc.info['cmdline'], "-id")
                 # Check if VM definition exists. If it is missing, qm commands will fail.
@@ -268,6 +471,10 @@ def collect_kvm_metrics():
             info_label_dict['pool3'] = ''
 
         info_dict["kvm"].add_metric([], info_label_dict)
+        usage = vm_usage[id] = {field: 0 for _, _, field in pool_rollup_settings}
+        usage["pool"] = info_label_dict['pool']
+        usage["pid"] = proc.pid
+        usage["vms"] = 1
 
         d = {
             "kvm_vcores": flag_to_label_value(cmdline,"-smp"),
@@ -280,20 +487,61 @@ def collect_kvm_metrics():
             gauge_dict[k].add_metric([id], v)
             logging.debug(f"gauge_dict[{k}].labels(id={id}).set({v})")
 
+        if d["kvm_vcores"].isnumeric():
+            usage["vcores"] = int(d["kvm_vcores"])
+        usage["maxmem"] = d["kvm_maxmem"]
+
         cpu_times = proc.cpu_times()
         for mode in ['user', 'system', 'iowait']:
             gauge_dict["kvm_cpu"].add_metric([id, mode], getattr(cpu_times,mode))
+        usage["cpu_seconds"] = cpu_times.user + cpu_times.system
 
         io = proc.io_counters()
         for io_type, attr in itertools.product(['read', 'write'], ['count', 'bytes', 'chars']):
             gauge_dict[f'kvm_io_{io_type}_{attr}'].add_metric([id], getattr(io, f"{io_type}_{attr}"))
+        usage["io_read_bytes"] = io.read_bytes
+        usage["io_write_bytes"] = io.write_bytes
 
         for type in [ "voluntary", "involuntary" ]:
             gauge_dict["kvm_ctx_switches"].add_metric([id, type], getattr(proc.num_ctx_switches(),type))
 
+        vhost_cpu, vhost_ctx = get_vhost_usage(vhost_workers.get(proc.pid, []))
+        if vhost_cpu is not None:
+            for mode, value in vhost_cpu.items():
+                gauge_dict["kvm_cpu"].add_metric([id, f"vhost_{mode}"], value)
+                usage["cpu_seconds"] += value
+            for type, value in vhost_ctx.items():
+                gauge_dict["kvm_ctx_switches"].add_metric([id, f"vhost_{type}"], value)
+
+        if cli_args.collect_guest_fs.lower() == 'true' and pveagent.agent_enabled(id):
+            # Served from cache, agents are queried in the background
+            for fs in pveagent.get_guest_fsinfo(id, proc.pid) or []:
+                fs_labels = [id, fs.get("mountpoint", ""), fs.get("type", ""), fs.get("name", "")]
+                if "total-bytes" in fs:
+                    gauge_dict["kvm_guest_fs_size"].add_metric(fs_labels, fs["total-bytes"])
+                if "used-bytes" in fs:
+                    gauge_dict["kvm_guest_fs_used"].add_metric(fs_labels, fs["used-bytes"])
+
+        if cli_args.collect_vhost_workers.lower() == 'true':
+            worker_stats = [(str(worker.pid), f"/proc/{worker.pid}/stat") for worker in vhost_workers.get(proc.pid, [])]
+            worker_stats += [(tid, f"/proc/{proc.pid}/task/{tid}/stat") for tid in find_vhost_threads(proc.pid, proc.info['num_threads'])]
+            worker_totals = []
+            for worker, stat_path in worker_stats:
+                try:
+                    user, system = read_thread_cpu_times(stat_path)
+                except FileNotFoundError:
+                    continue
+                gauge_dict["kvm_vhost_worker_cpu"].add_metric([id, worker, "user"], user)
+                gauge_dict["kvm_vhost_worker_cpu"].add_metric([id, worker, "system"], system)
+                worker_totals.append(user + system)
+            imbalance = max_mean_ratio(worker_totals)
+            if imbalance is not None:
+                gauge_dict["kvm_vhost_worker_imbalance"].add_metric([id], imbalance)
+
         memory_metrics = get_memory_info(proc.pid)  # Assuming proc.pid gives you the PID of the process
         for key, value in memory_metrics.items():
             gauge_dict["kvm_memory_extended"].add_metric([id, key], value)
+        usage["rss"] = memory_metrics.get("vmrss", 0)
 
     # upper limit on max_workers for safety
     with ThreadPoolExecutor(max_workers=16) as executor:
@@ -313,6 +561,10 @@ def collect_kvm_metrics():
                     metric_name = f"kvm_nic_{filename}"
                     gauge = create_or_get_gauge(metric_name, nic_labels.keys(), dynamic_gauges, gauge_lock)
                     gauge.add_metric(nic_labels.values(), value)
+                # Only this worker touches vm_usage[id]
+                vm_usage[id]["nic_rx_bytes"] += interface_stats.get("rx_bytes", 0)
+                vm_usage[id]["nic_tx_bytes"] += interface_stats.get("tx_bytes", 0)
+
 
         def map_disk_proc(id):
             for disk_name, disk_info in qmblock.extract_disk_info_from_monitor(id).items():
@@ -326,9 +578,40 @@ def collect_kvm_metrics():
                 else:
                     gauge_dict["kvm_disk_size"].add_metric([id, disk_name], qmblock.get_disk_size(disk_info["disk_path"], disk_info["disk_type"]))
 
+        def map_vcpu_proc(id, pid, expected_vcpus):
+            try:
+                for vcpu, tid in extract_vcpu_threads_from_monitor(id, pid, expected_vcpus).items():
+                    run_ns, wait_ns, timeslices, last_cpu = read_vcpu_thread_stats(pid, tid)
+                    gauge_dict["kvm_vcpu_run_time"].add_metric([id, vcpu], run_ns / 1e9)
+                    gauge_dict["kvm_vcpu_wait_time"].add_metric([id, vcpu], wait_ns / 1e9)
+                    gauge_dict["kvm_vcpu_timeslices"].add_metric([id, vcpu], timeslices)
+                    gauge_dict["kvm_vcpu_last_cpu"].add_metric([id, vcpu], last_cpu)
+            except (FileNotFoundError, ProcessLookupError):
+                # vCPU unplugged or VM exiting, query the monitor again next time
+                logging.debug(f"map_vcpu_proc: vCPU thread vanished for {id=}, dropping cache")
+                vcpu_thread_cache.pop(id, None)
+
         list(executor.map(map_netstat_proc, [ proc[2] for proc in procs ]))
+        if cli_args.collect_vcpu_stats.lower() == 'true':
+            list(executor.map(map_vcpu_proc, [ proc[2] for proc in procs ], [ proc[0].pid for proc in procs ], [ smp_vcpus(proc[1]) for proc in procs ]))
         list(executor.map(map_disk_proc, [ proc[2] for proc in procs ]))
 
+    # Forget vCPU threads of VMs that stopped or migrated away
+    running_ids = {proc[2] for proc in procs}
+    for id in list(vcpu_thread_cache):
+        if id not in running_ids:
+            del vcpu_thread_cache[id]
+    pveagent.prune_guest_agent_state(running_ids)
+    running_pids = {proc[0].pid for proc in procs}
+    for pid in list(vhost_thread_cache):
+        if pid not in running_pids:
+            del vhost_thread_cache[pid]
+
+    if collect_pool_rollup:
+        for (pool_name, level, scope), totals in rollup_pool_usage(vm_usage).items():
+            for name, _, field in pool_rollup_settings:
+                gauge_dict[name].add_metric([pool_name, level, scope], totals[field])
+
     for v in info_dict.values():
         yield v
     for v in dynamic_infos.values():
@@ -339,17 +622,23 @@ def collect_kvm_metrics():
         yield v
     logging.debug("collect_kvm_metrics() return")
 
+@pvecommon.coalesce_calls
+def collect_all_metrics():
+    # Materialized so that coalesced scrapes can each iterate the same result
+    metrics = []
+    if cli_args.collect_running_vms.lower() == 'true':
+        metrics.extend(collect_kvm_metrics())
+    if cli_args.collect_storage.lower() == 'true':
+        metrics.extend(pvestorage.collect_storage_metrics())
+    return metrics
+
 class PVECollector(object):
     def __init__(self):
         return
 
     def collect(self):
-        if cli_args.collect_running_vms.lower() == 'true':
-            for x in collect_kvm_metrics():
-                yield x
-        if cli_args.collect_storage.lower() == 'true':
-            for x in pvestorage.collect_storage_metrics():
-                yield x
+        for x in collect_all_metrics():
+            yield x
 
 def main():
     parser = argparse.ArgumentParser(description='PVE metrics exporter for Prometheus')
@@ -358,12 +647,21 @@ def main():
     parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL, help='THIS OPTION DOES NOTHING')
     parser.add_argument('--collect-running-vms', type=str, default='true', help='Enable or disable collecting running VMs metric (true/false)')
     parser.add_argument('--collect-storage', type=str, default='true', help='Enable or disable collecting storage info (true/false)')
+    parser.add_argument('--collect-vhost-workers', type=str, default='false', help='Enable or disable collecting per vhost worker CPU time, a per-queue-pair signal for vhost-net (true/false)')
+    parser.add_argument('--collect-vcpu-stats', type=str, default='true', help='Enable or disable collecting per-vCPU thread scheduler stats (true/false)')
+    parser.add_argument('--collect-guest-fs', type=str, default='false', help='Enable or disable collecting guest filesystem usage through the guest agent (true/false)')
+    parser.add_argument('--guest-fs-ttl', type=int, default=300, help='cache ttl for guest filesystem usage')
+    parser.add_argument('--guest-fs-max-age', type=int, default=1800, help='keep serving cached guest filesystem usage while refreshes fail, up to this age')
+    parser.add_argument('--guest-agent-timeout', type=float, default=2, help='timeout for a whole guest agent command')
+    parser.add_argument('--guest-agent-retry', type=int, default=60, help='wait this long before retrying a guest agent that failed')
+    parser.add_argument('--collect-pool-rollup', type=str, default='false', help='Enable or disable exporting per-pool aggregates of VM metrics (true/false)')
     parser.add_argument('--metrics-prefix', type=str, default=DEFAULT_PREFIX, help='<prefix>_ will be prepended to each metric name')
     parser.add_argument('--loglevel', type=str, default='INFO', help='Set log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)')
     parser.add_argument('--profile', type=str, default='false', help='collect metrics once, and print profiling stats')
     parser.add_argument('--qm-terminal-timeout', type=int, default=10, help='timeout for qm terminal commands')
     parser.add_argument('--qm-max-ttl', type=int, default=600, help='cache ttl for data pulled from qm monitor')
     parser.add_argument('--qm-rand', type=int, default=60, help='randomize qm monitor cache expiry')
+    parser.add_argument('--min-freshness', type=float, default=0, help='reuse collected metrics for this many seconds; concurrent scrapes always share one collection')
     parser.add_argument('--qm-monitor-defer-close', type=str, default="true", help='defer and retry closing unresponsive qm monitor sessions')
 
     # hack to access cli_args across modules
@@ -380,6 +678,11 @@ def main():
     pvecommon.qm_max_ttl = cli_args.qm_max_ttl
     pvecommon.qm_rand = cli_args.qm_rand
     pvecommon.qm_monitor_defer_close = cli_args.qm_monitor_defer_close
+    pvecommon.coalesce_min_freshness = cli_args.min_freshness
+    pveagent.guest_fs_ttl = cli_args.guest_fs_ttl
+    pveagent.guest_fs_max_age = cli_args.guest_fs_max_age
+    pveagent.guest_agent_retry = cli_args.guest_agent_retry
+    pveagent.guest_agent_timeout = cli_args.guest_agent_timeout
 
     if cli_args.profile.lower() == 'true':
         profiler = cProfile.Profile()
@@ -0,0 +1,181 @@
+import json
+import time
+import socket
+import threading
+
+import pytest
+
+import pveagent
+
+FSINFO = [{"name": "sda1", "mountpoint": "/", "type": "ext4", "total-bytes": 100, "used-bytes": 40}]
+
+class FakeAgent:
+    """
+    Minimal QGA server on a unix socket.
+    mode is "ok", "silent" (accepts connections, never answers), "malformed"
+    or "drip" (keeps sending a byte at a time, never completing a reply).
+    mode can be changed while the server runs.
+    """
+    def __init__(self, path, mode="ok"):
+        self.path = str(path)
+        self.mode = mode
+        self.held = []
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen()
+        if mode != "silent":
+            threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            if self.mode == "silent":
+                # Hold the connection open without ever replying
+                self.held.append(conn)
+                continue
+            with conn:
+                if self.mode == "drip":
+                    try:
+                        while True:
+                            conn.sendall(b'x')
+                            time.sleep(0.05)
+                    except OSError:
+                        continue
+                for line in conn.makefile('rb'):
+                    request = json.loads(line.lstrip(b'\xff'))
+                    if request["execute"] == "guest-sync-delimited":
+                        # Stale output from a previous client precedes the sentinel
+                        conn.sendall(b'stale\xff' + json.dumps({"return": request["arguments"]["id"]}).encode() + b'\n')
+                    elif self.mode == "malformed":
+                        conn.sendall(b'{"neither": "return nor error"}\n')
+                    else:
+                        conn.sendall(json.dumps({"return": FSINFO}).encode() + b'\n')
+
+    def stop_answering(self):
+        # New connections queue in the backlog and never get a reply
+        self.mode = "silent"
+
+    def close(self):
+        for conn in self.held:
+            conn.close()
+        self.sock.close()
+
+@pytest.fixture
+def agent_socket(tmp_path, monkeypatch):
+    agents = {}
+
+    def make(vm_id, mode="ok"):
+        agents[vm_id] = FakeAgent(tmp_path / f"{vm_id}.qga", mode)
+        return agents[vm_id]
+
+    monkeypatch.setattr(pveagent, "qga_socket_path", lambda vm_id: str(tmp_path / f"{vm_id}.qga"))
+    monkeypatch.setattr(pveagent, "guest_agent_timeout", 0.2)
+    for state in (pveagent._fsinfo_cache, pveagent._fsinfo_failures, pveagent._fsinfo_inflight, pveagent._agent_enabled_cache):
+        state.clear()
+    yield make
+    for agent in agents.values():
+        agent.close()
+
+def wait_for_refresh(vm_id, timeout=5):
+    deadline = time.time() + timeout
+    while vm_id in pveagent._fsinfo_inflight:
+        assert time.time() < deadline, f"refresh of {vm_id} never finished"
+        time.sleep(0.01)
+
+def test_qga_command_fsinfo(agent_socket):
+    path = agent_socket("100").path
+    assert pveagent.qga_command("100", "guest-get-fsinfo", socket_path=path) == FSINFO
+
+def test_qga_command_times_out_on_silent_agent(agent_socket):
+    path = agent_socket("101", mode="silent").path
+    start = time.time()
+    with pytest.raises(OSError):
+        pveagent.qga_command("101", "guest-get-fsinfo", socket_path=path)
+    assert time.time() - start < 2
+
+def test_qga_command_deadline_covers_whole_command(agent_socket):
+    path = agent_socket("103", mode="drip").path
+    start = time.time()
+    with pytest.raises(OSError):
+        pveagent.qga_command("103", "guest-get-fsinfo", timeout=0.3, socket_path=path)
+    assert time.time() - start < 1
+
+def test_qga_command_malformed_response(agent_socket):
+    path = agent_socket("102", mode="malformed").path
+    with pytest.raises(pveagent.GuestAgentError):
+        pveagent.qga_command("102", "guest-get-fsinfo", socket_path=path)
+
+def test_get_guest_fsinfo_is_cached(agent_socket):
+    agent_socket("100")
+    start = time.time()
+    assert pveagent.get_guest_fsinfo("100", 1) is None
+    assert time.time() - start < 0.1
+    wait_for_refresh("100")
+    assert pveagent.get_guest_fsinfo("100", 1) == FSINFO
+    assert "100" not in pveagent._fsinfo_inflight
+
+def test_silent_agent_backs_off(agent_socket):
+    agent_socket("101", mode="silent")
+    start = time.time()
+    assert pveagent.get_guest_fsinfo("101", 1) is None
+    assert time.time() - start < 0.1
+    wait_for_refresh("101")
+    assert "101" in pveagent._fsinfo_failures
+    # Backing off: no new refresh is scheduled
+    assert pveagent.get_guest_fsinfo("101", 1) is None
+    assert "101" not in pveagent._fsinfo_inflight
+
+@pytest.mark.parametrize("mode", ["malformed", "missing"])
+def test_failed_refresh_releases_vm(agent_socket, mode):
+    if mode != "missing":
+        agent_socket("102", mode=mode)
+    assert pveagent.get_guest_fsinfo("102", 1) is None
+    wait_for_refresh("102")
+    assert "102" in pveagent._fsinfo_failures
+    assert "102" not in pveagent._fsinfo_cache
+
+def test_agent_enabled_missing_config():
+    assert pveagent.agent_enabled("does-not-exist") is False
+
+def test_failed_refresh_keeps_last_good_entry(agent_socket, monkeypatch):
+    agent = agent_socket("100")
+    pveagent.get_guest_fsinfo("100", 1)
+    wait_for_refresh("100")
+    agent.stop_answering()
+
+    # Entry is stale, the refresh fails, the cached value is still served
+    monkeypatch.setattr(pveagent, "guest_fs_ttl", 0)
+    assert pveagent.get_guest_fsinfo("100", 1) == FSINFO
+    wait_for_refresh("100")
+    assert "100" in pveagent._fsinfo_failures
+    assert pveagent.get_guest_fsinfo("100", 1) == FSINFO
+
+    # Until it is older than guest_fs_max_age
+    monkeypatch.setattr(pveagent, "guest_fs_max_age", 0)
+    assert pveagent.get_guest_fsinfo("100", 1) is None
+
+def test_restarted_vm_does_not_get_old_fsinfo(agent_socket):
+    agent_socket("100")
+    pveagent.get_guest_fsinfo("100", 1)
+    wait_for_refresh("100")
+    assert pveagent.get_guest_fsinfo("100", 1) == FSINFO
+    assert pveagent.get_guest_fsinfo("100", 2) is None
+    wait_for_refresh("100")
+    assert pveagent.get_guest_fsinfo("100", 2) == FSINFO
+
+def test_prune_guest_agent_state(agent_socket):
+    agent_socket("100")
+    agent_socket("101", mode="silent")
+    pveagent.get_guest_fsinfo("100", 1)
+    pveagent.get_guest_fsinfo("101", 1)
+    wait_for_refresh("100")
+    wait_for_refresh("101")
+    pveagent._agent_enabled_cache["101"] = (0, True)
+
+    pveagent.prune_guest_agent_state({"100"})
+    assert "100" in pveagent._fsinfo_cache
+    assert "101" not in pveagent._fsinfo_failures
+    assert "101" not in pveagent._agent_enabled_cache
@@ -0,0 +1,107 @@
+import os
+import threading
+
+import pvemon
+
+def test_max_mean_ratio():
+    assert pvemon.max_mean_ratio([5, 5, 5, 5]) == 1.0
+    assert pvemon.max_mean_ratio([8, 0, 0, 0]) == 4.0
+    assert pvemon.max_mean_ratio([3, 1]) == 1.5
+    assert pvemon.max_mean_ratio([7]) is None
+    assert pvemon.max_mean_ratio([0, 0]) is None
+
+def test_find_vhost_threads():
+    pid = os.getpid()
+    started = threading.Event()
+    done = threading.Event()
+    tids = []
+
+    def worker():
+        tid = threading.get_native_id()
+        with open(f"/proc/{pid}/task/{tid}/comm", "w") as f:
+            f.write(f"vhost-{pid}")
+        tids.append(str(tid))
+        started.set()
+        done.wait()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    started.wait()
+    pvemon.vhost_thread_cache.clear()
+    try:
+        num_threads = len(os.listdir(f"/proc/{pid}/task"))
+        assert pvemon.find_vhost_threads(pid, num_threads) == tids
+        # Unchanged thread count is served from the cache
+        pvemon.vhost_thread_cache[pid] = (num_threads, ["cached"])
+        assert pvemon.find_vhost_threads(pid, num_threads) == ["cached"]
+        assert pvemon.find_vhost_threads(pid, num_threads + 1) == tids
+    finally:
+        done.set()
+        thread.join()
+
+def test_read_thread_cpu_times():
+    user, system = pvemon.read_thread_cpu_times(f"/proc/self/task/{threading.get_native_id()}/stat")
+    assert user >= 0 and system >= 0
+
+class FakeMonitor:
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.calls = 0
+
+    def __call__(self, vm_id, cmd):
+        self.calls += 1
+        return self.outputs.pop(0)
+
+    def invalidate_cache(self, vm_id, cmd):
+        pass
+
+CPUS_2 = "* CPU #0: thread_id=1001\r\n  CPU #1: thread_id=1002"
+
+def test_vcpu_threads_cached_for_pid(monkeypatch):
+    monitor = FakeMonitor([CPUS_2])
+    monkeypatch.setattr(pvemon.pvecommon, "qm_term_cmd", monitor)
+    pvemon.vcpu_thread_cache.clear()
+    assert pvemon.extract_vcpu_threads_from_monitor("100", 42, 2) == {"0": "1001", "1": "1002"}
+    assert pvemon.extract_vcpu_threads_from_monitor("100", 42, 2) == {"0": "1001", "1": "1002"}
+    assert monitor.calls == 1
+
+def test_vcpu_threads_incomplete_not_cached(monkeypatch):
+    monitor = FakeMonitor(["", "* CPU #0: thread_id=1001", CPUS_2, CPUS_2])
+    monkeypatch.setattr(pvemon.pvecommon, "qm_term_cmd", monitor)
+    pvemon.vcpu_thread_cache.clear()
+    assert pvemon.extract_vcpu_threads_from_monitor("100", 42, 2) == {}
+    assert pvemon.extract_vcpu_threads_from_monitor("100", 42, 2) == {"0": "1001"}
+    assert pvemon.extract_vcpu_threads_from_monitor("100", 42, 2) == {"0": "1001", "1": "1002"}
+    assert pvemon.extract_vcpu_threads_from_monitor("100", 42, 2) == {"0": "1001", "1": "1002"}
+    assert monitor.calls == 3
+
+def test_smp_vcpus():
+    assert pvemon.smp_vcpus(["-smp", "4,sockets=1,cores=4,maxcpus=4"]) == 4
+    assert pvemon.smp_vcpus(["-m", "1024"]) == 0
+
+def rollup_cpu(vm_usage):
+    fields = [field for _, _, field in pvemon.pool_rollup_settings]
+    usage = {
+        id: dict(dict.fromkeys(fields, 0), pool="a/b", pid=pid, vms=1, cpu_seconds=cpu)
+        for id, (pid, cpu) in vm_usage.items()
+    }
+    return pvemon.rollup_pool_usage(usage)[("a/b", "2", "pool")]["cpu_seconds"]
+
+def test_pool_rollup_vm_missed_then_back(monkeypatch):
+    pvemon.pool_counter_totals.clear()
+    pvemon.pool_counter_last.clear()
+    monkeypatch.setattr(pvemon.psutil, "pid_exists", lambda pid: pid == 42)
+    assert rollup_cpu({"100": (42, 12)}) == 12
+    # Missed for one collection while its qemu process is still alive
+    assert rollup_cpu({}) == 12
+    assert rollup_cpu({"100": (42, 13)}) == 13
+
+def test_pool_rollup_vm_gone(monkeypatch):
+    pvemon.pool_counter_totals.clear()
+    pvemon.pool_counter_last.clear()
+    monkeypatch.setattr(pvemon.psutil, "pid_exists", lambda pid: False)
+    assert rollup_cpu({"100": (42, 12), "101": (43, 5)}) == 17
+    assert rollup_cpu({"100": (42, 20)}) == 25
+    assert "101" not in pvemon.pool_counter_last
+    # Restarted under a new pid, its counters start from zero
+    assert rollup_cpu({"100": (44, 3)}) == 28